@@ -1,7 +1,7 @@
 # qpass: Frontend for pass (the standard unix password manager).
 #
 # Author: Peter Odding <peter@peterodding.com>
-# Last Change: December 3, 2018
+# Last Change: October 15, 2026
 # URL: https://github.com/xolox/python-qpass
 
 """
@@ -11,21 +11,28 @@ Frontend for pass_, the standard unix password manager.
 """
 
 # Standard library modules.
+import bisect
+import errno
 import fnmatch
+import functools
+import hashlib
+import json
 import logging
+import operator
 import os
 import platform
 import re
+import stat
+import sys
+import time
 
 # External dependencies.
 from executor import execute
 from executor.contexts import LocalContext
-from humanfriendly import Timer, coerce_pattern, format_path, parse_path
+from humanfriendly import Timer, coerce_boolean, coerce_pattern, format_path, parse_path
 from humanfriendly.terminal import HIGHLIGHT_COLOR, ansi_wrap, terminal_supports_colors
 from humanfriendly.prompts import prompt_for_choice
-from humanfriendly.text import concatenate, format, pluralize, split, trim_empty_lines
-from natsort import natsort
-from proc.gpg import get_gpg_variables
+from humanfriendly.text import concatenate, format, pluralize, trim_empty_lines
 from property_manager import (
     PropertyManager,
     cached_property,
@@ -41,6 +48,9 @@ from qpass.exceptions import EmptyPasswordStoreError, MissingPasswordStoreError,
 
 # Public identifiers that require documentation.
 __all__ = (
+    "CACHE_GRACE_PERIOD",
+    "CACHE_VARIABLE",
+    "CACHE_VERSION",
     "DEFAULT_DIRECTORY",
     "DIRECTORY_VARIABLE",
     "AbstractPasswordStore",
@@ -48,6 +58,8 @@ __all__ = (
     "PasswordStore",
     "QuickPass",
     "__version__",
+    "compile_filter",
+    "create_fuzzy_expression",
     "create_fuzzy_pattern",
     "logger",
 )
@@ -66,9 +78,38 @@ The value of :data:`DEFAULT_DIRECTORY` is normalized using
 DIRECTORY_VARIABLE = "PASSWORD_STORE_DIR"
 """The environment variable that sets the password storage directory (a string)."""
 
+CACHE_GRACE_PERIOD = 2
+"""
+The minimum age of directories before their listing is cached (a number of seconds).
+
+Refer to :func:`PasswordStore.save_cache()` for details.
+"""
+
+CACHE_VARIABLE = "QPASS_CACHE"
+"""
+The environment variable that enables caching of password names (a string).
+
+When this environment variable is set to a boolean true value (as parsed by
+:func:`~humanfriendly.coerce_boolean()`) the default value of
+:attr:`PasswordStore.cache_file` is a file in ``$XDG_CACHE_HOME/qpass``
+(which defaults to ``~/.cache/qpass``).
+"""
+
+CACHE_VERSION = 1
+"""The version of the format of :attr:`PasswordStore.cache_file` (an integer)."""
+
+IS_MACOS = platform.system().lower() == "darwin"
+""":data:`True` when running on macOS, :data:`False` otherwise."""
+
+_DIGIT_PATTERN = re.compile(r"[0-9]")
+"""A compiled regular expression to check whether natural order sorting is needed."""
+
 KEY_VALUE_PATTERN = re.compile(r"^(.+\S):\s+(\S.*)$")
 """A compiled regular expression to recognize "Key: Value" lines."""
 
+URL_PATTERN = re.compile(r"\S*://\S*")
+"""A compiled regular expression to recognize hyperlinks in the value of "Key: Value" lines."""
+
 # Initialize a logger for this module.
 logger = VerboseLogger(__name__)
 
@@ -104,24 +145,59 @@ class AbstractPasswordStore(PropertyManager):
     def filtered_entries(self):
         """A list of :class:`PasswordEntry` objects that don't match the exclude list."""
         return [
-            e for e in self.entries if not any(fnmatch.fnmatch(e.name.lower(), p.lower()) for p in self.exclude_list)
+            e
+            for e in self.entries
+            if not any(fnmatch.fnmatch(e.normalized_name, p.lower()) for p in self.exclude_list)
         ]
 
+    @cached_property
+    def normalized_names(self):
+        """
+        The lowercased names of the :attr:`filtered_entries` (a list of strings).
+
+        This is used by :func:`simple_search()` and :func:`fuzzy_search()` to
+        avoid lowercasing the name of every password on every search.
+        """
+        return [e.normalized_name for e in self.filtered_entries]
+
+    @cached_property
+    def normalized_offsets(self):
+        """
+        The offsets of the :attr:`normalized_names` in :attr:`normalized_text` (a list of integers).
+
+        The list ends with the length of :attr:`normalized_text`, so the name
+        at index ``i`` ends just before ``normalized_offsets[i + 1]``.
+        """
+        offsets = [0]
+        for name in self.normalized_names:
+            offsets.append(offsets[-1] + len(name) + 1)
+        return offsets
+
+    @cached_property
+    def normalized_text(self):
+        """
+        The :attr:`normalized_names` terminated by NUL characters and concatenated (a string).
+
+        This enables :func:`simple_search()` to search for a keyword in all
+        names using a single :meth:`str.find()` call (NUL characters can't
+        appear in filenames, so a match can't span two names).
+        """
+        return "".join(name + "\0" for name in self.normalized_names)
+
     def fuzzy_search(self, *filters):
         """
         Perform a "fuzzy" search that matches the given characters in the given order.
 
         :param filters: The pattern(s) to search for.
-        :returns: The matched password names (a list of strings).
+        :returns: The matched passwords (a list of :class:`PasswordEntry` objects).
         """
-        matches = []
         logger.verbose(
             "Performing fuzzy search on %s (%s) ..", pluralize(len(filters), "pattern"), concatenate(map(repr, filters))
         )
-        patterns = list(map(create_fuzzy_pattern, filters))
-        for entry in self.filtered_entries:
-            if all(p.search(entry.name) for p in patterns):
-                matches.append(entry)
+        # We match against the lowercased names that are also used by
+        # simple_search() so that smart_search() computes them only once.
+        match = _create_combined_fuzzy_pattern(*filters).match
+        matches = [e for e, n in zip(self.filtered_entries, self.normalized_names) if match(n)]
         logger.log(
             logging.INFO if matches else logging.VERBOSE,
             "Matched %s using fuzzy search.",
@@ -134,14 +210,19 @@ class AbstractPasswordStore(PropertyManager):
         Select a password from the available choices.
 
         :param arguments: Refer to :func:`smart_search()`.
-        :returns: The name of a password (a string) or :data:`None`
-                  (when no password matched the given `arguments`).
+        :returns: The selected :class:`PasswordEntry` object.
+        :raises: Refer to :func:`smart_search()`.
+
+        When more than one password matches the user is prompted to choose
+        one. Because the prompt needs to show all of the matches there's no
+        way to stop searching after the first match.
         """
         matches = self.smart_search(*arguments)
         if len(matches) > 1:
             logger.info("More than one match, prompting for choice ..")
             labels = [entry.name for entry in matches]
-            return matches[labels.index(prompt_for_choice(labels))]
+            entries = dict(zip(labels, matches))
+            return entries[prompt_for_choice(labels)]
         else:
             logger.info("Matched one entry: %s", matches[0].name)
             return matches[0]
@@ -151,9 +232,9 @@ class AbstractPasswordStore(PropertyManager):
         Perform a simple search for case insensitive substring matches.
 
         :param keywords: The string(s) to search for.
-        :returns: The matched password names (a generator of strings).
+        :returns: The matched passwords (a list of :class:`PasswordEntry` objects).
 
-        Only passwords whose names matches *all*  of the given keywords are
+        Only passwords whose names match *all* of the given keywords are
         returned.
         """
         matches = []
@@ -163,10 +244,32 @@ class AbstractPasswordStore(PropertyManager):
             pluralize(len(keywords), "keyword"),
             concatenate(map(repr, keywords)),
         )
-        for entry in self.filtered_entries:
-            normalized = entry.name.lower()
-            if all(kw in normalized for kw in keywords):
-                matches.append(entry)
+        # Check the longest (usually most selective) keywords first
+        # so that all() can give up on non-matching entries sooner.
+        keywords.sort(key=len, reverse=True)
+        # Keywords contained in a longer keyword don't need to be checked.
+        selective = []
+        for kw in keywords:
+            if not any(kw in other for other in selective):
+                selective.append(kw)
+        keywords = selective
+        entries = self.filtered_entries
+        names = self.normalized_names
+        if keywords and keywords[0] and "\0" not in keywords[0]:
+            # Search for the first keyword in all names at once and
+            # check the other keywords only for the names that match.
+            text = self.normalized_text
+            offsets = self.normalized_offsets
+            position = text.find(keywords[0])
+            while position >= 0:
+                index = bisect.bisect_right(offsets, position) - 1
+                if all(kw in names[index] for kw in keywords[1:]):
+                    matches.append(entries[index])
+                position = text.find(keywords[0], offsets[index + 1])
+        else:
+            for entry, normalized in zip(entries, names):
+                if all(kw in normalized for kw in keywords):
+                    matches.append(entry)
         logger.log(
             logging.INFO if matches else logging.VERBOSE,
             "Matched %s using simple search.",
@@ -179,7 +282,7 @@ class AbstractPasswordStore(PropertyManager):
         Perform a smart search on the given keywords or patterns.
 
         :param arguments: The keywords or patterns to search for.
-        :returns: The matched password names (a list of strings).
+        :returns: The matched passwords (a list of :class:`PasswordEntry` objects).
         :raises: The following exceptions can be raised:
 
                  - :exc:`.NoMatchingPasswordError` when no matching passwords are found.
@@ -217,11 +320,20 @@ class QuickPass(AbstractPasswordStore):
 
     @cached_property
     def entries(self):
-        """A list of :class:`PasswordEntry` objects."""
-        passwords = []
+        """
+        A list of :class:`PasswordEntry` objects.
+
+        When the same name exists in more than one password store only the
+        entry in the first of those password stores is included.
+        """
+        if len(self.stores) == 1:
+            # The entries of a single password store are already sorted.
+            return list(self.stores[0].entries)
+        passwords = {}
         for store in self.stores:
-            passwords.extend(store.entries)
-        return natsort(passwords, key=lambda e: e.name)
+            for entry in store.entries:
+                passwords.setdefault(entry.name, entry)
+        return _natural_sort(passwords.values(), key=operator.attrgetter("name"))
 
     @mutable_property(cached=True)
     def stores(self):
@@ -240,6 +352,23 @@ class PasswordStore(AbstractPasswordStore):
     repr_properties = ["directory", "entries"]
     """The properties included in the output of :func:`repr()`."""
 
+    @mutable_property
+    def cache_file(self):
+        """
+        The pathname of a file used to cache the names of passwords (a string or :data:`None`).
+
+        Defaults to :attr:`default_cache_file`. When a pathname is set, the
+        names of the passwords in :attr:`directory` are stored in the given
+        file together with the modification times of the directories that
+        were scanned. As long as none of those directories change, the next
+        :class:`PasswordStore` object can load its :attr:`entries` from the
+        cache file instead of scanning the complete directory tree.
+
+        Caching is only supported when :attr:`context` is a
+        :class:`~executor.contexts.LocalContext` object.
+        """
+        return self.default_cache_file
+
     @mutable_property(cached=True)
     def context(self):
         """
@@ -262,15 +391,27 @@ class PasswordStore(AbstractPasswordStore):
         self.ensure_directory_exists()
         # Prepare the environment variables.
         environment = {DIRECTORY_VARIABLE: self.directory}
-        try:
-            # Try to enable the GPG agent in headless sessions.
-            environment.update(get_gpg_variables())
-        except Exception:
-            # If we failed then let's at least make sure that the
-            # $GPG_TTY environment variable is set correctly.
-            environment.update(GPG_TTY=execute("tty", capture=True, check=False, tty=True, silent=True))
+        environment.update(self._gpg_env)
         return LocalContext(directory=self.directory, environment=environment)
 
+    @cached_property
+    def default_cache_file(self):
+        """
+        The default value of :attr:`cache_file` (a string or :data:`None`).
+
+        When the environment variable given by :data:`CACHE_VARIABLE` is set to
+        a boolean true value this is ``$XDG_CACHE_HOME/qpass/*.json`` where the
+        filename is the SHA1 hash of :attr:`directory` (so each password store
+        gets its own cache file), otherwise it's :data:`None` which means
+        caching is disabled.
+        """
+        if coerce_boolean(os.environ.get(CACHE_VARIABLE, "false")):
+            directory = self.directory
+            if not isinstance(directory, bytes):
+                directory = directory.encode("UTF-8")
+            filename = "%s.json" % hashlib.sha1(directory).hexdigest()
+            return parse_path(os.path.join(os.environ.get("XDG_CACHE_HOME") or "~/.cache", "qpass", filename))
+
     @mutable_property(cached=True)
     def directory(self):
         """
@@ -284,7 +425,8 @@ class PasswordStore(AbstractPasswordStore):
 
         When you set the :attr:`directory` property, the value you set will be
         normalized using :func:`~humanfriendly.parse_path()` and the computed
-        value of the :attr:`context` property is cleared.
+        values of the :attr:`default_cache_file`, :attr:`context` and
+        :attr:`entries` properties are cleared.
         """
         return parse_path(os.environ.get(DIRECTORY_VARIABLE, DEFAULT_DIRECTORY))
 
@@ -293,25 +435,86 @@ class PasswordStore(AbstractPasswordStore):
         """Normalize the value of :attr:`directory` when it's set."""
         # Normalize the value of `directory'.
         set_property(self, "directory", parse_path(value))
-        # Clear the computed values of `context' and `entries'.
+        # Clear the computed values of `default_cache_file', `context' and
+        # `entries' as well as the properties derived from `entries'.
         clear_property(self, "context")
+        clear_property(self, "default_cache_file")
         clear_property(self, "entries")
+        clear_property(self, "filtered_entries")
+        clear_property(self, "normalized_names")
+        clear_property(self, "normalized_offsets")
+        clear_property(self, "normalized_text")
 
     @cached_property
     def entries(self):
-        """A list of :class:`PasswordEntry` objects."""
+        """
+        A list of :class:`PasswordEntry` objects.
+
+        When :attr:`cache_file` is set the names of the passwords are loaded
+        from the cache file if it's still valid (see :func:`load_cache()`),
+        otherwise the directory is scanned and the cache file is updated.
+        """
         timer = Timer()
-        passwords = []
-        logger.info("Scanning %s ..", format_path(self.directory))
-        listing = self.context.capture("find", "-type", "f", "-name", "*.gpg", "-print0")
-        for filename in split(listing, "\0"):
-            basename, extension = os.path.splitext(filename)
-            if extension == ".gpg":
-                # We use os.path.normpath() to remove the leading `./' prefixes
-                # that `find' adds because it searches the working directory.
-                passwords.append(PasswordEntry(name=os.path.normpath(basename), store=self))
+        names = None
+        if isinstance(self.context, LocalContext):
+            if self.cache_file:
+                names = self.load_cache()
+            if names is None:
+                # Scan local directories in-process (this avoids running `find').
+                logger.info("Scanning %s ..", format_path(self.directory))
+                # The modification times of directories are only needed (and
+                # os.stat() is only called) when the cache file is enabled.
+                directories = {} if self.cache_file else None
+                # The filenames produced by find_password_files() all have
+                # a `.gpg' extension, so we can simply strip the last four
+                # characters.
+                names = _natural_sort(fn[:-4] for fn in self.find_password_files(directories))
+                if directories is not None:
+                    self.save_cache(names, directories)
+        else:
+            logger.info("Scanning %s ..", format_path(self.directory))
+            listing = self.context.capture(
+                "find", "-name", ".git", "-prune", "-o", "-type", "f", "-name", "?*.gpg", "-print0"
+            )
+            # We use os.path.normpath() to remove the leading `./' prefixes
+            # that `find' adds because it searches the working directory.
+            names = _natural_sort(os.path.normpath(fn)[:-4] for fn in listing.split("\0") if fn)
+        passwords = [PasswordEntry(name=n, store=self) for n in names]
         logger.verbose("Found %s in %s.", pluralize(len(passwords), "password"), timer)
-        return natsort(passwords, key=lambda e: e.name)
+        return passwords
+
+    @cached_property
+    def _gpg_env(self):
+        """
+        The environment variables that enable the GPG agent (a dictionary).
+
+        In headless sessions the GPG agent is enabled using
+        :func:`proc.gpg.get_gpg_variables()`. If that fails the ``$GPG_TTY``
+        environment variable is set using the output of the ``tty`` program.
+        The result is computed once per password store (it isn't cleared when
+        :attr:`directory` is set) so that the external programs involved are
+        run only once, even when :attr:`context` is recreated.
+        """
+        try:
+            # We import proc.gpg here because it's relatively expensive to import.
+            from proc.gpg import get_gpg_variables
+            return get_gpg_variables()
+        except Exception:
+            # If we failed then let's at least make sure that the
+            # $GPG_TTY environment variable is set correctly.
+            return dict(GPG_TTY=execute("tty", capture=True, check=False, tty=True, silent=True))
+
+    @mutable_property
+    def parallel_scan(self):
+        """
+        :data:`True` to scan subdirectories concurrently, :data:`False` otherwise.
+
+        This defaults to :data:`False` because password stores are usually
+        small enough that a sequential scan is fastest, however on large
+        password stores with a cold disk cache (or on network filesystems)
+        overlapping the I/O of several directories can be much faster.
+        """
+        return False
 
     def ensure_directory_exists(self):
         """
@@ -324,6 +527,100 @@ class PasswordStore(AbstractPasswordStore):
             msg = "The password storage directory doesn't exist! (%s)"
             raise MissingPasswordStoreError(msg % self.directory)
 
+    def find_password_files(self, directories=None):
+        """
+        Find the ``*.gpg`` files in :attr:`directory`.
+
+        :param directories: An optional dictionary that will be filled with the
+                            modification times of the scanned directories
+                            (keyed by their pathnames relative to
+                            :attr:`directory`).
+        :returns: A generator of filenames relative to :attr:`directory`
+                  (without a leading ``./`` prefix).
+
+        The directory tree is scanned using :func:`_walk_directory()` so that
+        no external programs need to be run. When :attr:`parallel_scan` is
+        :data:`True` :func:`_walk_parallel()` is used instead. The ``.git``
+        directory created by ``pass git init`` is skipped (like ``pass grep``
+        does) because it never contains passwords but can contain lots of
+        files.
+
+        Like ``find -type f`` (which is used for other execution contexts)
+        only regular files are reported, so symbolic links (including
+        dangling ones) are ignored.
+        """
+        walker = _walk_parallel(self.directory) if self.parallel_scan else _walk_directory(self.directory)
+        for root, dirs, files in walker:
+            prefix = "" if root == self.directory else os.path.relpath(root, self.directory)
+            if directories is not None:
+                directories[prefix] = os.stat(root).st_mtime
+            if ".git" in dirs:
+                dirs.remove(".git")
+            for filename in files:
+                if filename.endswith(".gpg") and filename != ".gpg":
+                    yield os.path.join(prefix, filename)
+
+    def load_cache(self):
+        """
+        Load the names of passwords from :attr:`cache_file`.
+
+        :returns: A list of password names (strings) or :data:`None` when the
+                  cache file doesn't exist, can't be read or is out of date.
+
+        The cache is out of date when the modification time of one of the
+        directories that were scanned has changed (adding, removing or
+        renaming a file or directory changes the modification time of the
+        directory that contains it).
+        """
+        try:
+            with open(self.cache_file) as handle:
+                cache = json.load(handle)
+            if cache.get("version") != CACHE_VERSION or cache.get("directory") != self.directory:
+                return None
+            for pathname, mtime in cache["directories"].items():
+                if os.stat(os.path.join(self.directory, pathname)).st_mtime != mtime:
+                    logger.verbose("Ignoring cache file because %s was modified.", pathname or "the top directory")
+                    return None
+            logger.verbose("Loaded password names from cache file %s.", format_path(self.cache_file))
+            return cache["entries"]
+        except Exception as e:
+            if not (isinstance(e, (IOError, OSError)) and e.errno == errno.ENOENT):
+                logger.warning("Failed to load cache file %s! (%s)", format_path(self.cache_file), e)
+            return None
+
+    def save_cache(self, names, directories):
+        """
+        Save the names of passwords to :attr:`cache_file`.
+
+        :param names: A list of password names (strings).
+        :param directories: A dictionary with modification times of directories
+                            (refer to :func:`find_password_files()`).
+
+        The cache file is written atomically (by renaming a temporary file)
+        and is only readable by the current user. When a directory was
+        modified less than :data:`CACHE_GRACE_PERIOD` seconds ago the cache
+        file isn't written, because a change within the resolution of the
+        filesystem's timestamps wouldn't be detected.
+        """
+        if any(mtime > time.time() - CACHE_GRACE_PERIOD for mtime in directories.values()):
+            logger.verbose("Not updating cache file because the password store was just modified.")
+            return
+        temporary_file = "%s.%i.tmp" % (self.cache_file, os.getpid())
+        try:
+            cache_directory = os.path.dirname(self.cache_file)
+            if cache_directory and not os.path.isdir(cache_directory):
+                os.makedirs(cache_directory)
+            handle = os.fdopen(os.open(temporary_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w")
+            with handle:
+                json.dump(
+                    dict(version=CACHE_VERSION, directory=self.directory, directories=directories, entries=names),
+                    handle,
+                )
+            os.rename(temporary_file, self.cache_file)
+            logger.verbose("Saved password names to cache file %s.", format_path(self.cache_file))
+        except Exception as e:
+            logger.warning("Failed to save cache file %s! (%s)", format_path(self.cache_file), e)
+
 
 class PasswordEntry(PropertyManager):
 
@@ -341,6 +638,17 @@ class PasswordEntry(PropertyManager):
     def name(self):
         """The name of the password store entry (a string)."""
 
+    @cached_property
+    def normalized_name(self):
+        """
+        The lowercased :attr:`name` of the entry (a string).
+
+        This is cached so that the name of an entry is lowercased only once,
+        even when the entry is shared between a :class:`PasswordStore` and a
+        :class:`QuickPass` object.
+        """
+        return self.name.lower()
+
     @cached_property
     def password(self):
         """The password identified by :attr:`name` (a string)."""
@@ -355,6 +663,11 @@ class PasswordEntry(PropertyManager):
         """The full text of the entry (a string)."""
         return self.context.capture("pass", "show", self.name)
 
+    @cached_property
+    def title(self):
+        """The :attr:`name` of the entry formatted for display (a string)."""
+        return " / ".join(self.name.split("/"))
+
     def copy_password(self):
         """Copy the password to the clipboard."""
         self.context.execute("pass", "show", "--clip", self.name)
@@ -382,45 +695,45 @@ class PasswordEntry(PropertyManager):
         """
         # Determine whether we can use ANSI escape sequences.
         if use_colors is None:
-            use_colors = terminal_supports_colors()
+            use_colors = _stream_supports_colors(sys.stdout)
         # Extract the password (first line) from the entry.
         lines = self.text.splitlines()
         password = lines.pop(0).strip()
         # Compile the given patterns to case insensitive regular expressions
         # and use them to ignore lines that match any of the given filters.
-        patterns = [coerce_pattern(f, re.IGNORECASE) for f in filters]
-        lines = [l for l in lines if not any(p.search(l) for p in patterns)]
+        patterns = [compile_filter(f) for f in filters]
+        if patterns:
+            lines = [l for l in lines if not any(p.search(l) for p in patterns)]
         text = trim_empty_lines("\n".join(lines))
         # Include the password in the formatted text?
         if include_password:
             text = "Password: %s\n%s" % (password, text)
         # Add the name to the entry (only when there's something to show).
         if text and not text.isspace():
-            title = " / ".join(split(self.name, "/"))
+            title = self.title
             if use_colors:
                 title = ansi_wrap(title, bold=True)
             text = "%s\n\n%s" % (title, text)
-        # Highlight the entry's text using ANSI escape sequences.
-        lines = []
-        for line in text.splitlines():
-            # Check for a "Key: Value" line.
-            match = KEY_VALUE_PATTERN.match(line)
-            if match:
-                key = "%s:" % match.group(1).strip()
-                value = match.group(2).strip()
-                if use_colors:
+        lines = text.splitlines()
+        # Highlight the entry's text using ANSI escape sequences (the loop
+        # is skipped entirely when colors are disabled because it would
+        # leave every line unchanged).
+        if use_colors:
+            match_key_value = KEY_VALUE_PATTERN.match
+            underline = ansi_wrap(r"\g<0>", underline=True)
+            for i, line in enumerate(lines):
+                # Check for a "Key: Value" line (the substring test is
+                # much cheaper than the regular expression).
+                match = ":" in line and match_key_value(line)
+                if match:
                     # Highlight the key.
-                    key = ansi_wrap(key, color=HIGHLIGHT_COLOR)
+                    key = ansi_wrap("%s:" % match.group(1).strip(), color=HIGHLIGHT_COLOR)
                     # Underline hyperlinks in the value.
-                    tokens = value.split()
-                    for i in range(len(tokens)):
-                        if "://" in tokens[i]:
-                            tokens[i] = ansi_wrap(tokens[i], underline=True)
+                    value = URL_PATTERN.sub(underline, match.group(2).strip())
                     # Replace the line with a highlighted version.
-                    line = key + " " + " ".join(tokens)
-            if padding:
-                line = "  " + line
-            lines.append(line)
+                    lines[i] = key + " " + value
+        if padding:
+            lines = ["  " + line for line in lines]
         text = "\n".join(lines)
         text = trim_empty_lines(text)
         if text and padding:
@@ -428,6 +741,72 @@ class PasswordEntry(PropertyManager):
         return text
 
 
+def _memoize(function, maxsize=1024):
+    """
+    Cache the return values of a function based on its positional arguments.
+
+    :param function: The function whose return values should be cached.
+    :param maxsize: The maximum number of cached values (an integer). When
+                    this limit is reached the cache is reset.
+    :returns: The decorated function.
+
+    The cache can be reset by calling the ``cache_clear()`` method of the
+    decorated function.
+    """
+    cache = {}
+
+    @functools.wraps(function)
+    def wrapper(*args):
+        try:
+            return cache[args]
+        except KeyError:
+            if len(cache) >= maxsize:
+                cache.clear()
+            value = function(*args)
+            cache[args] = value
+            return value
+
+    wrapper.cache_clear = cache.clear
+    return wrapper
+
+
+@_memoize
+def compile_filter(pattern):
+    """
+    Compile a filter for :func:`PasswordEntry.format_text()`.
+
+    :param pattern: A regular expression pattern (a string or a compiled
+                    regular expression object).
+    :returns: A compiled, case insensitive regular expression object.
+
+    This is a cached wrapper for :func:`~humanfriendly.coerce_pattern()`.
+    """
+    return coerce_pattern(pattern, re.IGNORECASE)
+
+
+@_memoize
+def _create_combined_fuzzy_pattern(*patterns):
+    """
+    Convert one or more strings into a single fuzzy regular expression pattern.
+
+    :param patterns: The input pattern(s) (one or more strings).
+    :returns: A compiled regular expression object.
+
+    The resulting expression contains a lookahead assertion for each of the
+    given patterns (see :func:`create_fuzzy_pattern()`) so that a single
+    ``match()`` call checks whether all of the patterns match, regardless of
+    the order in which they appear. The compiled expressions are cached.
+
+    The patterns are converted to lowercase and the resulting expression is
+    case sensitive, so it should be matched against lowercased strings (like
+    :attr:`AbstractPasswordStore.normalized_names`). This is considerably
+    faster than a case insensitive expression.
+    """
+    expression = "".join("(?=%s)" % create_fuzzy_expression(p.lower(), anchored=True) for p in patterns)
+    return re.compile(expression)
+
+
+@_memoize
 def create_fuzzy_pattern(pattern):
     """
     Convert a string into a fuzzy regular expression pattern.
@@ -435,11 +814,36 @@ def create_fuzzy_pattern(pattern):
     :param pattern: The input pattern (a string).
     :returns: A compiled regular expression object.
 
-    This function works by adding ``.*`` between each of the characters in the
-    input pattern and compiling the resulting expression into a case
-    insensitive regular expression.
+    This function works by allowing arbitrary text between each of the
+    characters in the input pattern (see :func:`create_fuzzy_expression()`)
+    and compiling the resulting expression into a case insensitive regular
+    expression. The compiled expressions are cached so that repeated searches
+    for the same pattern don't recompile them.
+    """
+    return re.compile(create_fuzzy_expression(pattern), re.IGNORECASE)
+
+
+def create_fuzzy_expression(pattern, anchored=False):
+    """
+    Convert a string into the source of a fuzzy regular expression.
+
+    :param pattern: The input pattern (a string).
+    :param anchored: :data:`True` if the expression will be matched at the
+                     start of a string, :data:`False` otherwise.
+    :returns: A regular expression (a string).
+
+    The text between two characters of the input pattern is matched using a
+    negated character class (for example ``a[^b]*b`` instead of ``a.*b``).
+    This matches the same strings but avoids the backtracking that makes
+    ``.*`` slow on long names that almost match.
     """
-    return re.compile(".*".join(map(re.escape, pattern)), re.IGNORECASE)
+    expression = []
+    for i, character in enumerate(pattern):
+        escaped = re.escape(character)
+        if i > 0 or anchored:
+            expression.append("[^%s]*" % escaped)
+        expression.append(escaped)
+    return "".join(expression)
 
 
 def is_clipboard_supported():
@@ -448,4 +852,151 @@ def is_clipboard_supported():
 
     :returns: :data:`True` if the clipboard is supported, :data:`False` otherwise.
     """
-    return platform.system().lower() == "darwin" or bool(os.environ.get("DISPLAY"))
+    return IS_MACOS or bool(os.environ.get("DISPLAY"))
+
+
+def _list_directory(directory):
+    """
+    Get the subdirectories and regular files in a directory.
+
+    :param directory: The pathname of a directory (a string).
+    :returns: A tuple with two lists of strings: The names of the
+              subdirectories and the names of the regular files (symbolic
+              links are excluded from both lists). When the directory can't
+              be listed (for example because it was removed) :data:`None`
+              is returned.
+
+    On Python 3.5+ :func:`os.scandir()` is used, which means the types of
+    the entries are usually known from the directory listing itself and no
+    :func:`os.lstat()` call per entry is needed. On older Python versions
+    :func:`os.listdir()` and :func:`os.lstat()` are used instead.
+    """
+    dirs, files = [], []
+    try:
+        if hasattr(os, "scandir"):
+            for entry in os.scandir(directory):
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.append(entry.name)
+                elif entry.is_file(follow_symlinks=False):
+                    files.append(entry.name)
+        else:
+            for name in os.listdir(directory):
+                try:
+                    mode = os.lstat(os.path.join(directory, name)).st_mode
+                except OSError:
+                    # The entry was removed while we were scanning.
+                    continue
+                if stat.S_ISDIR(mode):
+                    dirs.append(name)
+                elif stat.S_ISREG(mode):
+                    files.append(name)
+    except OSError:
+        return None
+    return dirs, files
+
+
+def _natural_sort(values, key=None):
+    """
+    Sort strings (or objects) using natural order sorting.
+
+    :param values: An iterable of strings (or objects, see `key`).
+    :param key: An optional function to get the string to sort by.
+    :returns: A sorted list.
+
+    Natural order sorting only differs from regular sorting for strings that
+    contain digits, so when none of the strings contain digits the (much
+    faster) built in sorting is used and :mod:`natsort` isn't imported.
+    """
+    values = list(values)
+    strings = [key(v) for v in values] if key else values
+    if not _DIGIT_PATTERN.search("".join(strings)):
+        return sorted(values, key=key)
+    from natsort import natsort
+    return natsort(values, key=key)
+
+
+def _stream_supports_colors(stream):
+    """
+    Check whether a stream is connected to a terminal that supports ANSI escape sequences.
+
+    :param stream: The stream to check (a file-like object).
+    :returns: :data:`True` if ANSI escape sequences are supported,
+              :data:`False` otherwise.
+
+    This is a cached wrapper for
+    :func:`~humanfriendly.terminal.terminal_supports_colors()`, so that the
+    terminal isn't probed again when the same stream is checked repeatedly.
+    Only the result for the most recently checked stream is remembered, so
+    replaced streams (like captured output) aren't kept alive and streams
+    don't need to be hashable.
+    """
+    cached_stream, supported = _stream_supports_colors.cache
+    if stream is not cached_stream:
+        supported = terminal_supports_colors(stream)
+        _stream_supports_colors.cache = (stream, supported)
+    return supported
+
+
+# The initial placeholder never matches a stream given by the caller.
+_stream_supports_colors.cache = (object(), False)
+
+
+def _walk_directory(directory):
+    """
+    Walk a directory tree using :func:`_list_directory()`.
+
+    :param directory: The pathname of the top level directory (a string).
+    :returns: A generator of tuples like the ones generated by
+              :func:`os.walk()`, except that only regular files are
+              reported (symbolic links are never included).
+
+    Like :func:`os.walk()` the caller can remove entries from the list of
+    subdirectories to avoid scanning them, and directories that can't be
+    listed are skipped.
+    """
+    pending = [directory]
+    while pending:
+        root = pending.pop()
+        result = _list_directory(root)
+        if result is not None:
+            dirs, files = result
+            yield root, dirs, files
+            pending.extend(os.path.join(root, d) for d in reversed(dirs))
+
+
+def _walk_parallel(directory, concurrency=None):
+    """
+    Walk a directory tree using a pool of threads.
+
+    :param directory: The pathname of the top level directory (a string).
+    :param concurrency: The number of threads to use (an integer, defaults to
+                        four times the number of CPU cores with a maximum
+                        of 32).
+    :returns: A generator of tuples like the ones generated by
+              :func:`_walk_directory()` (in breadth first order).
+
+    Each level of the directory tree is scanned concurrently using
+    :func:`_list_directory()`. Like :func:`os.walk()` the caller can remove
+    entries from the list of subdirectories to avoid scanning them, and
+    directories that can't be listed are skipped.
+    """
+    # We import multiprocessing here because parallel scanning is optional
+    # and importing multiprocessing noticeably slows down our startup.
+    import multiprocessing
+    from multiprocessing.pool import ThreadPool
+    if concurrency is None:
+        concurrency = min(32, multiprocessing.cpu_count() * 4)
+    pool = ThreadPool(concurrency)
+    try:
+        pending = [directory]
+        while pending:
+            subdirectories = []
+            for root, result in zip(pending, pool.map(_list_directory, pending)):
+                if result is None:
+                    continue
+                dirs, files = result
+                yield root, dirs, files
+                subdirectories.extend(os.path.join(root, d) for d in dirs)
+            pending = subdirectories
+    finally:
+        pool.terminate()
@@ -1,7 +1,7 @@
 # qpass: Frontend for pass (the standard unix password manager).
 #
 # Author: Peter Odding <peter@peterodding.com>
-# Last Change: December 3, 2018
+# Last Change: October 15, 2026
 # URL: https://github.com/xolox/python-qpass
 
 """
@@ -26,6 +26,11 @@ be shown on the terminal, to share any additional details about the password
 entry (for example the associated username or email address). The -q, --quiet
 option suppresses this text.
 
+To avoid scanning your password store on every run you can set the environment
+variable $QPASS_CACHE to 'true'. This caches the names of your passwords in
+~/.cache/qpass (the cache is refreshed automatically when passwords are added,
+removed or renamed).
+
 Supported options:
 
   -e, --edit
@@ -52,7 +57,8 @@ Supported options:
     You can use the -p, --password-store option multiple times to search more
     than one password store at the same time. No distinction is made between
     passwords in different password stores, so the names of passwords need to
-    be recognizable and unique.
+    be recognizable and unique (when the same name exists in more than one
+    password store the first password store wins).
 
   -f, --filter=PATTERN
 
@@ -84,15 +90,28 @@ import logging
 import sys
 
 # External dependencies.
-import coloredlogs
 from humanfriendly.terminal import output, usage, warning
 
 # Modules included in our package.
-from qpass import PasswordStore, QuickPass, is_clipboard_supported
+from qpass import PasswordStore, QuickPass, compile_filter, is_clipboard_supported
 from qpass.exceptions import PasswordStoreError
 
 # Public identifiers that require documentation.
-__all__ = ("edit_matching_entry", "list_matching_entries", "logger", "main", "show_matching_entry")
+__all__ = (
+    "LONG_OPTIONS",
+    "SHORT_OPTIONS",
+    "edit_matching_entry",
+    "list_matching_entries",
+    "logger",
+    "main",
+    "show_matching_entry",
+)
+
+SHORT_OPTIONS = "elnp:f:x:vqh"
+"""The short command line options supported by :func:`main()` (a string for :func:`getopt.gnu_getopt()`)."""
+
+LONG_OPTIONS = ["edit", "list", "no-clipboard", "password-store=", "filter=", "exclude=", "verbose", "quiet", "help"]
+"""The long command line options supported by :func:`main()` (a list for :func:`getopt.gnu_getopt()`)."""
 
 # Initialize a logger for this module.
 logger = logging.getLogger(__name__)
@@ -100,20 +119,14 @@ logger = logging.getLogger(__name__)
 
 def main():
     """Command line interface for the ``qpass`` program."""
-    # Initialize logging to the terminal.
-    coloredlogs.install()
     # Prepare for command line argument parsing.
     action = show_matching_entry
     program_opts = dict(exclude_list=[])
-    show_opts = dict(filters=[], use_clipboard=is_clipboard_supported())
-    verbosity = 0
+    show_opts = dict(filters=[])
+    verbosity_changes = []
     # Parse the command line arguments.
     try:
-        options, arguments = getopt.gnu_getopt(
-            sys.argv[1:],
-            "elnp:f:x:vqh",
-            ["edit", "list", "no-clipboard", "password-store=", "filter=", "exclude=", "verbose", "quiet", "help"],
-        )
+        options, arguments = getopt.gnu_getopt(sys.argv[1:], SHORT_OPTIONS, LONG_OPTIONS)
         for option, value in options:
             if option in ("-e", "--edit"):
                 action = edit_matching_entry
@@ -125,15 +138,15 @@ def main():
                 stores = program_opts.setdefault("stores", [])
                 stores.append(PasswordStore(directory=value))
             elif option in ("-f", "--filter"):
-                show_opts["filters"].append(value)
+                # Compile the pattern here so that invalid regular
+                # expressions are reported like other usage errors.
+                show_opts["filters"].append(compile_filter(value))
             elif option in ("-x", "--exclude"):
                 program_opts["exclude_list"].append(value)
             elif option in ("-v", "--verbose"):
-                coloredlogs.increase_verbosity()
-                verbosity += 1
+                verbosity_changes.append(1)
             elif option in ("-q", "--quiet"):
-                coloredlogs.decrease_verbosity()
-                verbosity -= 1
+                verbosity_changes.append(-1)
             elif option in ("-h", "--help"):
                 usage(__doc__)
                 return
@@ -145,10 +158,24 @@ def main():
     except Exception as e:
         warning("Error: %s", e)
         sys.exit(1)
+    # Initialize logging to the terminal. We import coloredlogs here because
+    # it isn't needed to show the usage message or report usage errors.
+    import coloredlogs
+    coloredlogs.install()
+    for change in verbosity_changes:
+        if change > 0:
+            coloredlogs.increase_verbosity()
+        else:
+            coloredlogs.decrease_verbosity()
     # Execute the requested action.
     try:
-        show_opts["quiet"] = verbosity < 0
-        kw = show_opts if action == show_matching_entry else {}
+        kw = {}
+        if action == show_matching_entry:
+            # Only check for clipboard support when it's actually needed.
+            if "use_clipboard" not in show_opts:
+                show_opts["use_clipboard"] = is_clipboard_supported()
+            show_opts["quiet"] = sum(verbosity_changes) < 0
+            kw = show_opts
         action(QuickPass(**program_opts), arguments, **kw)
     except PasswordStoreError as e:
         # Known issues don't get a traceback.
@@ -1,7 +1,7 @@
 # Test suite for the `qpass' Python package.
 #
 # Author: Peter Odding <peter@peterodding.com>
-# Last Change: December 3, 2018
+# Last Change: October 15, 2026
 # URL: https://github.com/xolox/python-qpass
 
 """Test suite for the `qpass` package."""
@@ -10,6 +10,9 @@
 import logging
 import os
 import platform
+import shutil
+import tempfile
+import time
 
 # External dependencies.
 from humanfriendly.testing import (
@@ -22,31 +25,154 @@ from humanfriendly.testing import (
     TestCase,
     random_string,
     run_cli,
-    touch,
 )
-from humanfriendly.terminal import ansi_strip
+from humanfriendly.terminal import ansi_strip, ansi_wrap
 from humanfriendly.text import dedent
 from mock import MagicMock
 from property_manager import set_property
 
 # The module we're testing.
 import qpass
-from qpass import DIRECTORY_VARIABLE, PasswordEntry, PasswordStore, cli, is_clipboard_supported
+from qpass import (
+    CACHE_VARIABLE,
+    DIRECTORY_VARIABLE,
+    PasswordEntry,
+    PasswordStore,
+    QuickPass,
+    _create_combined_fuzzy_pattern,
+    _list_directory,
+    _natural_sort,
+    _stream_supports_colors,
+    _walk_parallel,
+    cli,
+    create_fuzzy_pattern,
+    is_clipboard_supported,
+)
 from qpass.cli import main
 from qpass.exceptions import EmptyPasswordStoreError, MissingPasswordStoreError, NoMatchingPasswordError
 
 # Initialize a logger for this module.
 logger = logging.getLogger(__name__)
 
+SHARED_STORES = dict(
+    discovery=["foo", "foo/bar", "foo/bar/baz", "Also with spaces", ".git/ignored"],
+    fuzzy=["Personal/Zabbix", "Work/Zabbix", "Something else"],
+    simple=["foo", "bar", "baz"],
+    smart=["abcdef", "aabbccddeeff", "Google"],
+)
+"""
+The password stores shared by tests that don't modify them (a dictionary).
+
+The keys are the names of subdirectories of the directory created by
+:func:`QuickPassTestCase.setUpClass()` and the values are lists with the
+names of the passwords in each password store.
+"""
+
+FORMATTED_ENTRY = dedent(
+    """
+    {title}
+
+    Password: {password}
+    """
+)
+"""The expected output of :func:`.PasswordEntry.format_text()` for an entry without details (a string)."""
+
+PASSWORD = random_string()
+"""A random password for dummy password store entries (a string)."""
+
+RAM_DISK = "/dev/shm"
+"""
+A RAM backed filesystem for temporary directories (a string).
+
+When this directory exists and is writable the temporary directories created
+by the test suite are created inside it, to avoid disk I/O.
+"""
+
 
 class QuickPassTestCase(TestCase):
 
     """:mod:`unittest` compatible container for `qpass` tests."""
 
+    @classmethod
+    def setUpClass(cls):
+        """Create the password stores in :data:`SHARED_STORES` (once)."""
+        # Create all temporary directories inside a single parent directory
+        # (on a RAM disk when possible) that's removed by tearDownClass().
+        use_ram_disk = os.path.isdir(RAM_DISK) and os.access(RAM_DISK, os.W_OK)
+        cls.saved_tempdir = tempfile.tempdir
+        cls.temporary_directory = tempfile.mkdtemp(dir=RAM_DISK if use_ram_disk else None)
+        tempfile.tempdir = cls.temporary_directory
+        cls.shared_directory = tempfile.mkdtemp()
+        cls.shared_stores = {}
+        for store, names in SHARED_STORES.items():
+            create_passwords(os.path.join(cls.shared_directory, store), *names)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Cleanup the password stores in :data:`SHARED_STORES` and other temporary directories."""
+        tempfile.tempdir = cls.saved_tempdir
+        shutil.rmtree(cls.temporary_directory)
+
+    def get_shared_directory(self, store):
+        """Get the pathname of one of the password stores in :data:`SHARED_STORES`."""
+        return os.path.join(self.shared_directory, store)
+
+    def get_shared_store(self, store):
+        """
+        Get a :class:`.PasswordStore` object for one of the password stores in :data:`SHARED_STORES`.
+
+        The objects are shared between tests so that each password store is
+        scanned only once. Tests must not modify the returned object.
+        """
+        if store not in self.shared_stores:
+            self.shared_stores[store] = PasswordStore(directory=self.get_shared_directory(store))
+        return self.shared_stores[store]
+
+    def test_cache_file(self):
+        """Test caching of password names."""
+        with TemporaryDirectory() as cache_directory:
+            cache_file = os.path.join(cache_directory, "entries.json")
+            with TemporaryDirectory() as directory:
+                create_passwords(directory, "foo", "foo/bar")
+                # Make sure the directories are older than the grace period.
+                backdate(directory, os.path.join(directory, "foo"))
+                program = PasswordStore(directory=directory, cache_file=cache_file)
+                assert [e.name for e in program.entries] == ["foo", "foo/bar"]
+                assert os.path.isfile(cache_file)
+                # Make sure the cache file is used instead of scanning.
+                program = PasswordStore(directory=directory, cache_file=cache_file)
+                program.find_password_files = MagicMock(side_effect=AssertionError)
+                assert [e.name for e in program.entries] == ["foo", "foo/bar"]
+                # Make sure the cache file is invalidated by changes.
+                create_passwords(directory, "foo/baz")
+                program = PasswordStore(directory=directory, cache_file=cache_file)
+                assert [e.name for e in program.entries] == ["foo", "foo/bar", "foo/baz"]
+
+    def test_cache_variable(self):
+        """Test enabling of the cache using ``$QPASS_CACHE``."""
+        with TemporaryDirectory() as cache_directory:
+            with PatchedItem(os.environ, "XDG_CACHE_HOME", cache_directory):
+                with PatchedItem(os.environ, CACHE_VARIABLE, "false"):
+                    assert PasswordStore(directory="/some/store").cache_file is None
+                with PatchedItem(os.environ, CACHE_VARIABLE, "true"):
+                    program = PasswordStore(directory="/some/store")
+                    assert program.cache_file.startswith(os.path.join(cache_directory, "qpass", ""))
+                    assert program.cache_file.endswith(".json")
+                    # Make sure each password store gets its own cache file.
+                    other_file = PasswordStore(directory="/other/store").cache_file
+                    assert program.cache_file != other_file
+                    program.directory = "/other/store"
+                    assert program.cache_file == other_file
+        # Make sure an explicitly set cache file is preserved.
+        program = PasswordStore(cache_file="/tmp/x.json", directory="/tmp")
+        assert program.cache_file == "/tmp/x.json"
+        program.directory = "/some/store"
+        assert program.cache_file == "/tmp/x.json"
+
     def test_cli_defaults(self):
         """Test default password store discovery in command line interface."""
         with MockedHomeDirectory() as home:
-            touch(os.path.join(home, ".password-store", "the-only-entry.gpg"))
+            create_passwords(os.path.join(home, ".password-store"), "the-only-entry")
             returncode, output = run_cli(main, "-l")
             assert returncode == 0
             entries = output.splitlines(False)
@@ -57,46 +183,32 @@ class QuickPassTestCase(TestCase):
         returncode, output = run_cli(main, "-x", merged=True)
         assert returncode != 0
         assert "Error:" in output
+        # Make sure invalid filter patterns are reported in the same way.
+        returncode, output = run_cli(main, "--filter=(", "foo", merged=True)
+        assert returncode != 0
+        assert "Error:" in output
 
     def test_cli_list(self):
-        """Test the output of ``qpass --list``."""
-        with TemporaryDirectory() as directory:
-            touch(os.path.join(directory, "foo.gpg"))
-            touch(os.path.join(directory, "foo/bar.gpg"))
-            touch(os.path.join(directory, "Also with spaces.gpg"))
-            returncode, output = run_cli(main, "--password-store=%s" % directory, "--list")
-            assert returncode == 0
-            entries = output.splitlines()
-            assert "foo" in entries
-            assert "foo/bar" in entries
-            assert "Also with spaces" in entries
-
-    def test_cli_exclude(self):
         """Test the output of ``qpass --exclude=... --list``."""
-        with TemporaryDirectory() as directory:
-            touch(os.path.join(directory, "foo.gpg"))
-            touch(os.path.join(directory, "foo/bar.gpg"))
-            touch(os.path.join(directory, "Also with spaces.gpg"))
-            returncode, output = run_cli(main, "--password-store=%s" % directory, "--exclude=*bar*", "--list")
-            assert returncode == 0
-            entries = output.splitlines()
-            assert "foo" in entries
-            assert "foo/bar" not in entries
-            assert "Also with spaces" in entries
+        directory = self.get_shared_directory("discovery")
+        returncode, output = run_cli(main, "--password-store=%s" % directory, "--exclude=*baz*", "--list")
+        assert returncode == 0
+        entries = output.splitlines()
+        assert entries == ["Also with spaces", "foo", "foo/bar"]
 
     def test_cli_filter(self):
         """Test filtering of entry text."""
         # Generate a password and some additional text for a dummy password store entry.
-        a_password = random_string()
         additional_text = random_string()
         sensitive_detail = "password: %s" % random_string()
-        raw_entry = a_password + "\n\n" + additional_text + "\n" + sensitive_detail
+        raw_entry = PASSWORD + "\n\n" + additional_text + "\n" + sensitive_detail
         # Some voodoo to mock methods in classes that
         # have yet to be instantiated follows :-).
-        mocked_class = type("TestPasswordEntry", (PasswordEntry,), dict(copy_password=MagicMock(), text=raw_entry))
+        mocked_class = type("TestPasswordEntry", (PasswordEntry,), dict(text=raw_entry))
+        mocked_class.copy_password = lambda self: None
         with PatchedAttribute(qpass, "PasswordEntry", mocked_class):
             with TemporaryDirectory() as directory:
-                touch(os.path.join(directory, "foo.gpg"))
+                create_passwords(directory, "foo")
                 returncode, output = run_cli(main, "--password-store=%s" % directory, "--filter=^password:", "foo")
                 # Make sure the command succeeded.
                 assert returncode == 0
@@ -107,9 +219,8 @@ class QuickPassTestCase(TestCase):
     def test_cli_quiet(self):
         """Test copying of a password without echoing the entry's text."""
         # Generate a password and some additional text for a dummy password store entry.
-        a_password = random_string()
         additional_text = random_string()
-        raw_entry = a_password + "\n\n" + additional_text
+        raw_entry = PASSWORD + "\n\n" + additional_text
         # Prepare a mock method to test that the password is copied,
         # but without actually invoking the `pass' program.
         copy_password_method = MagicMock()
@@ -120,7 +231,7 @@ class QuickPassTestCase(TestCase):
         with PatchedAttribute(qpass, "PasswordEntry", mocked_class):
             with PatchedAttribute(cli, "is_clipboard_supported", lambda: True):
                 with TemporaryDirectory() as directory:
-                    touch(os.path.join(directory, "foo.gpg"))
+                    create_passwords(directory, "foo")
                     returncode, output = run_cli(main, "--password-store=%s" % directory, "--quiet", "foo")
                     # Make sure the command succeeded.
                     assert returncode == 0
@@ -150,6 +261,35 @@ class QuickPassTestCase(TestCase):
             with PatchedAttribute(os, "environ", environment):
                 assert is_clipboard_supported() is False
 
+    def test_create_combined_fuzzy_pattern(self):
+        """Test that combined fuzzy patterns match all filters in any order."""
+        pattern = _create_combined_fuzzy_pattern("ZBX", "p/")
+        assert pattern.match("personal/zabbix")
+        assert not pattern.match("work/zabbix")
+        assert _create_combined_fuzzy_pattern("ZBX", "p/") is pattern
+
+    def test_create_fuzzy_pattern(self):
+        """Test that compiled fuzzy patterns are reused."""
+        pattern = create_fuzzy_pattern("p/z")
+        assert pattern.search("Personal/Zabbix")
+        assert create_fuzzy_pattern("p/z") is pattern
+        # Make sure special characters are escaped properly.
+        assert create_fuzzy_pattern("a]^-b").search("a] ^ - b")
+        assert not create_fuzzy_pattern("a]^-b").search("a ^ - b")
+        create_fuzzy_pattern.cache_clear()
+        assert create_fuzzy_pattern("p/z").pattern == pattern.pattern
+
+    def test_directory_change(self):
+        """Test that changing the directory invalidates cached search data."""
+        with TemporaryDirectory() as first:
+            with TemporaryDirectory() as second:
+                create_passwords(first, "foo")
+                create_passwords(second, "bar")
+                program = PasswordStore(directory=first)
+                assert [e.name for e in program.simple_search("o")] == ["foo"]
+                program.directory = second
+                assert [e.name for e in program.simple_search("a")] == ["bar"]
+
     def test_directory_variable(self):
         """Test support for ``$PASSWORD_STORE_DIR``."""
         with TemporaryDirectory() as directory:
@@ -161,8 +301,7 @@ class QuickPassTestCase(TestCase):
         """Test editing of an entry on the command line."""
         # Create a fake password store that we can test against.
         with TemporaryDirectory() as directory:
-            touch(os.path.join(directory, "Personal", "Zabbix.gpg"))
-            touch(os.path.join(directory, "Work", "Zabbix.gpg"))
+            create_passwords(directory, "Personal/Zabbix", "Work/Zabbix")
             # Make sure we're not running the real `pass' program because its
             # intended purpose is user interaction, which has no place in an
             # automated test suite :-).
@@ -177,52 +316,71 @@ class QuickPassTestCase(TestCase):
             program = PasswordStore(directory=directory)
             self.assertRaises(EmptyPasswordStoreError, program.smart_search)
 
+    def test_exclude_list(self):
+        """Test that passwords can be excluded using filename patterns."""
+        program = PasswordStore(directory=self.get_shared_directory("discovery"), exclude_list=["*BAR*"])
+        assert [e.name for e in program.filtered_entries] == ["Also with spaces", "foo"]
+        assert [e.name for e in program.smart_search("foo")] == ["foo"]
+
     def test_format_text(self):
         """Test human friendly formatting of password store entries."""
         entry = PasswordEntry(name="some/random/password", store=object())
-        set_property(entry, "text", random_string())
+        set_property(entry, "text", PASSWORD)
         self.assertEquals(
             # We enable ANSI escape sequences but strip them before we
             # compare the generated string. This may seem rather pointless
             # but it ensures that the relevant code paths are covered :-).
             dedent(ansi_strip(entry.format_text(include_password=True, use_colors=True))),
-            dedent(
-                """
-                some / random / password
-
-                Password: {value}
-            """,
-                value=entry.text,
-            ),
+            FORMATTED_ENTRY.format(title="some / random / password", password=entry.text),
         )
 
+    def test_format_text_hyperlinks(self):
+        """Test highlighting of hyperlinks in password store entries."""
+        entry = PasswordEntry(name="some/random/password", store=object())
+        set_property(entry, "text", "\n".join([PASSWORD, "URL: <https://example.com/login>, http://x"]))
+        formatted = entry.format_text(include_password=False, use_colors=True, padding=False)
+        assert ansi_wrap("<https://example.com/login>,", underline=True) in formatted
+        assert ansi_wrap("http://x", underline=True) in formatted
+        assert "URL: <https://example.com/login>, http://x" in ansi_strip(formatted)
+
     def test_fuzzy_search(self):
         """Test fuzzy searching."""
-        with TemporaryDirectory() as directory:
-            touch(os.path.join(directory, "Personal/Zabbix.gpg"))
-            touch(os.path.join(directory, "Work/Zabbix.gpg"))
-            touch(os.path.join(directory, "Something else.gpg"))
-            program = PasswordStore(directory=directory)
-            # Test a fuzzy search with multiple matches.
-            matches = program.fuzzy_search("zbx")
-            assert len(matches) == 2
-            assert any(entry.name == "Personal/Zabbix" for entry in matches)
-            assert any(entry.name == "Work/Zabbix" for entry in matches)
-            # Test a fuzzy search with a single match.
-            matches = program.fuzzy_search("p/z")
-            assert len(matches) == 1
-            assert matches[0].name == "Personal/Zabbix"
-            # Test a fuzzy search with `the other' match.
-            matches = program.fuzzy_search("w/z")
-            assert len(matches) == 1
-            assert matches[0].name == "Work/Zabbix"
+        program = self.get_shared_store("fuzzy")
+        # Test a fuzzy search with multiple matches.
+        matches = program.fuzzy_search("zbx")
+        assert len(matches) == 2
+        assert any(entry.name == "Personal/Zabbix" for entry in matches)
+        assert any(entry.name == "Work/Zabbix" for entry in matches)
+        # Test a fuzzy search with a single match.
+        matches = program.fuzzy_search("p/z")
+        assert len(matches) == 1
+        assert matches[0].name == "Personal/Zabbix"
+        # Test a fuzzy search with `the other' match.
+        matches = program.fuzzy_search("w/z")
+        assert len(matches) == 1
+        assert matches[0].name == "Work/Zabbix"
 
     def test_get_password(self):
         """Test getting a password from an entry."""
-        random_password = random_string()
         entry = PasswordEntry(name="some/random/password", store=object())
-        set_property(entry, "text", "\n".join([random_password, "", "This is the description"]))
-        self.assertEquals(random_password, entry.password)
+        set_property(entry, "text", "\n".join([PASSWORD, "", "This is the description"]))
+        self.assertEquals(PASSWORD, entry.password)
+
+    def test_gpg_environment(self):
+        """Test that the GPG environment is computed once per password store."""
+        with TemporaryDirectory() as first:
+            with TemporaryDirectory() as second:
+                store = PasswordStore(directory=first)
+                environment = store._gpg_env
+                assert isinstance(environment, dict)
+                for directory in first, second:
+                    # Changing the directory recreates the context but reuses the environment.
+                    store.directory = directory
+                    context = store.context
+                    assert store._gpg_env is environment
+                    assert context.options["environment"][DIRECTORY_VARIABLE] == directory
+                    for name, value in environment.items():
+                        assert context.options["environment"][name] == value
 
     def test_missing_password_store_error(self):
         """Test the MissingPasswordStoreError exception."""
@@ -231,107 +389,181 @@ class QuickPassTestCase(TestCase):
             program = PasswordStore(directory=missing)
             self.assertRaises(MissingPasswordStoreError, program.ensure_directory_exists)
 
+    def test_multiple_stores(self):
+        """Test querying multiple password stores as one."""
+        with TemporaryDirectory() as first:
+            with TemporaryDirectory() as second:
+                create_passwords(first, "foo10", "foo2")
+                create_passwords(second, "foo1", "foo2")
+                program = QuickPass(stores=[PasswordStore(directory=first), PasswordStore(directory=second)])
+                assert [e.name for e in program.entries] == ["foo1", "foo2", "foo10"]
+                # Duplicate names are resolved in favor of the first password store.
+                assert program.entries[1].store.directory == first
+                program = QuickPass(stores=[PasswordStore(directory=first)])
+                assert [e.name for e in program.entries] == ["foo2", "foo10"]
+
+    def test_natural_sort(self):
+        """Test that natural order sorting is only used when it's needed."""
+        # Names without digits are sorted using the built in sorting.
+        assert _natural_sort(["b", "a", "B", "a/c"]) == ["B", "a", "a/c", "b"]
+        # Names with digits are sorted in natural order.
+        assert _natural_sort(["a10", "a9", "b", "a1"]) == ["a1", "a9", "a10", "b"]
+        # The key argument is supported.
+        assert _natural_sort([("v10",), ("v2",)], key=lambda t: t[0]) == [("v2",), ("v10",)]
+
     def test_no_matching_password_error(self):
         """Test the NoMatchingPasswordError exception."""
+        program = self.get_shared_store("simple")
+        self.assertRaises(NoMatchingPasswordError, program.smart_search, "x")
+
+    def test_parallel_scan(self):
+        """Test password discovery using concurrent directory scanning."""
         with TemporaryDirectory() as directory:
-            touch(os.path.join(directory, "Whatever.gpg"))
-            program = PasswordStore(directory=directory)
-            self.assertRaises(NoMatchingPasswordError, program.smart_search, "x")
+            create_passwords(directory, "foo", "foo/bar", "foo/bar/baz", "qux/quux", ".git/ignored")
+            program = PasswordStore(directory=directory, parallel_scan=True)
+            assert [e.name for e in program.entries] == ["foo", "foo/bar", "foo/bar/baz", "qux/quux"]
+
+    def test_parallel_scan_missing_directory(self):
+        """Test that parallel scanning skips directories that can't be listed."""
+        with TemporaryDirectory() as directory:
+            missing = os.path.join(directory, "missing")
+            assert _list_directory(missing) is None
+            assert list(_walk_parallel(missing)) == []
 
     def test_password_discovery(self):
         """Test password discovery."""
+        program = self.get_shared_store("discovery")
+        assert len(program.entries) == 4
+        assert program.entries[0].name == "Also with spaces"
+        assert program.entries[1].name == "foo"
+        assert program.entries[2].name == "foo/bar"
+        assert program.entries[3].name == "foo/bar/baz"
+
+    def test_password_discovery_symlinks(self):
+        """Test that symbolic links are ignored by password discovery (like ``find -type f``)."""
         with TemporaryDirectory() as directory:
-            touch(os.path.join(directory, "foo.gpg"))
-            touch(os.path.join(directory, "foo/bar.gpg"))
-            touch(os.path.join(directory, "foo/bar/baz.gpg"))
-            touch(os.path.join(directory, "Also with spaces.gpg"))
-            program = PasswordStore(directory=directory)
-            assert len(program.entries) == 4
-            assert program.entries[0].name == "Also with spaces"
-            assert program.entries[1].name == "foo"
-            assert program.entries[2].name == "foo/bar"
-            assert program.entries[3].name == "foo/bar/baz"
+            create_passwords(directory, "foo")
+            os.symlink("foo.gpg", os.path.join(directory, "link.gpg"))
+            os.symlink("missing.gpg", os.path.join(directory, "broken.gpg"))
+            for parallel_scan in False, True:
+                program = PasswordStore(directory=directory, parallel_scan=parallel_scan)
+                assert [e.name for e in program.entries] == ["foo"]
+
+    def test_password_discovery_using_find(self):
+        """Test password discovery using ``find`` in custom execution contexts."""
+        context = MagicMock()
+        context.capture.return_value = "./foo.gpg\0./foo/bar.gpg\0./Also with spaces.gpg\0"
+        program = PasswordStore(context=context)
+        assert [e.name for e in program.entries] == ["Also with spaces", "foo", "foo/bar"]
 
     def test_select_entry(self):
         """Test password selection."""
-        with TemporaryDirectory() as directory:
-            touch(os.path.join(directory, "foo.gpg"))
-            touch(os.path.join(directory, "bar.gpg"))
-            touch(os.path.join(directory, "baz.gpg"))
-            program = PasswordStore(directory=directory)
-            # Substring search.
-            entry = program.select_entry("fo")
-            assert entry.name == "foo"
-            # Fuzzy search.
-            entry = program.select_entry("bz")
-            assert entry.name == "baz"
+        program = self.get_shared_store("simple")
+        # Substring search.
+        entry = program.select_entry("fo")
+        assert entry.name == "foo"
+        # Fuzzy search.
+        entry = program.select_entry("bz")
+        assert entry.name == "baz"
 
     def test_select_entry_interactive(self):
         """Test interactive password selection."""
-        with TemporaryDirectory() as directory:
-            touch(os.path.join(directory, "foo.gpg"))
-            touch(os.path.join(directory, "bar.gpg"))
-            touch(os.path.join(directory, "baz.gpg"))
-            # Select entries using the command line filter 'a' and then use
-            # interactive selection to narrow the choice down to 'baz' by
-            # specifying the unique substring 'z'.
-            program = PasswordStore(directory=directory)
-            with CaptureOutput(input="z"):
-                entry = program.select_entry("a")
-                assert entry.name == "baz"
+        # Select entries using the command line filter 'a' and then use
+        # interactive selection to narrow the choice down to 'baz' by
+        # specifying the unique substring 'z'.
+        program = self.get_shared_store("simple")
+        with CaptureOutput(input="z"):
+            entry = program.select_entry("a")
+            assert entry.name == "baz"
+
+    def test_stream_supports_colors(self):
+        """Test the caching of terminal color support detection."""
+        class UnhashableStream(object):
+            __hash__ = None
+
+            def isatty(self):
+                return False
+
+        stream = UnhashableStream()
+        assert _stream_supports_colors(stream) is False
+        assert _stream_supports_colors.cache[0] is stream
+        # Make sure only the most recently checked stream is remembered.
+        other_stream = UnhashableStream()
+        assert _stream_supports_colors(other_stream) is False
+        assert _stream_supports_colors.cache[0] is other_stream
 
     def test_show_entry(self):
         """Test showing of an entry on the terminal."""
-        password = random_string()
         # Some voodoo to mock methods in classes that
         # have yet to be instantiated follows :-).
-        mocked_class = type("TestPasswordEntry", (PasswordEntry,), dict(text=password))
+        mocked_class = type("TestPasswordEntry", (PasswordEntry,), dict(text=PASSWORD))
         with PatchedAttribute(qpass, "PasswordEntry", mocked_class):
             with TemporaryDirectory() as directory:
                 name = "some/random/password"
-                touch(os.path.join(directory, "%s.gpg" % name))
+                create_passwords(directory, name)
                 returncode, output = run_cli(main, "--password-store=%s" % directory, "--no-clipboard", name)
                 assert returncode == 0
-                assert dedent(output) == dedent(
-                    """
-                    {title}
-
-                    Password: {password}
-                    """,
-                    title=name.replace("/", " / "),
-                    password=password,
-                )
+                assert dedent(output) == FORMATTED_ENTRY.format(title=name.replace("/", " / "), password=PASSWORD)
 
     def test_simple_search(self):
         """Test simple substring searching."""
-        with TemporaryDirectory() as directory:
-            touch(os.path.join(directory, "foo.gpg"))
-            touch(os.path.join(directory, "bar.gpg"))
-            touch(os.path.join(directory, "baz.gpg"))
-            program = PasswordStore(directory=directory)
-            matches = program.simple_search("fo")
-            assert len(matches) == 1
-            assert matches[0].name == "foo"
-            matches = program.simple_search("a")
-            assert len(matches) == 2
-            assert matches[0].name == "bar"
-            assert matches[1].name == "baz"
-            matches = program.simple_search("b", "z")
-            assert len(matches) == 1
-            assert matches[0].name == "baz"
+        program = self.get_shared_store("simple")
+        matches = program.simple_search("fo")
+        assert len(matches) == 1
+        assert matches[0].name == "foo"
+        matches = program.simple_search("a")
+        assert len(matches) == 2
+        assert matches[0].name == "bar"
+        assert matches[1].name == "baz"
+        matches = program.simple_search("b", "z")
+        assert len(matches) == 1
+        assert matches[0].name == "baz"
+        # Make sure redundant keywords don't change the results.
+        matches = program.simple_search("A", "ba", "a", "", "ba")
+        assert [m.name for m in matches] == ["bar", "baz"]
+        # Make sure a keyword can't match across two names.
+        assert not program.simple_search("rb")
+        # Make sure empty keywords match everything.
+        assert len(program.simple_search("")) == 3
+        assert len(program.simple_search()) == 3
 
     def test_smart_search(self):
         """Test smart searching."""
-        with TemporaryDirectory() as directory:
-            touch(os.path.join(directory, "abcdef.gpg"))
-            touch(os.path.join(directory, "aabbccddeeff.gpg"))
-            touch(os.path.join(directory, "Google.gpg"))
-            program = PasswordStore(directory=directory)
-            # Test a substring match that avoids fuzzy matching.
-            matches = program.smart_search("abc")
-            assert len(matches) == 1
-            assert matches[0].name == "abcdef"
-            # Test a fuzzy match to confirm that the fall back works.
-            matches = program.smart_search("gg")
-            assert len(matches) == 1
-            assert matches[0].name == "Google"
+        program = self.get_shared_store("smart")
+        # Test a substring match that avoids fuzzy matching.
+        matches = program.smart_search("abc")
+        assert len(matches) == 1
+        assert matches[0].name == "abcdef"
+        # Test a fuzzy match to confirm that the fall back works.
+        matches = program.smart_search("gg")
+        assert len(matches) == 1
+        assert matches[0].name == "Google"
+
+
+def backdate(*pathnames):
+    """Set the modification times of the given pathnames to one minute ago."""
+    timestamp = time.time() - 60
+    for pathname in pathnames:
+        os.utime(pathname, (timestamp, timestamp))
+
+
+def create_passwords(directory, *names):
+    """
+    Create empty password files in a password store.
+
+    :param directory: The pathname of the password store (a string).
+    :param names: The names of the passwords to create (strings without
+                  the ``.gpg`` extension).
+
+    Unlike :func:`~humanfriendly.testing.touch()` this creates each parent
+    directory only once, no matter how many passwords it contains.
+    """
+    parents = set()
+    for name in names:
+        filename = os.path.join(directory, "%s.gpg" % name)
+        parent = os.path.dirname(filename)
+        if parent not in parents:
+            if not os.path.isdir(parent):
+                os.makedirs(parent)
+            parents.add(parent)
+        open(filename, "w").close()